@@ -1,155 +1,423 @@
 import streamlit as st
+import hashlib
+import itertools
 import json
+import logging
+import mmap
 import os
+import re
+import shelve
+import tempfile
+import threading
 from datetime import datetime
-from langchain_community.llms import Ollama
+import ollama
+import orjson
 from langchain.prompts import PromptTemplate
 
+# Fixed instructions sent at the start of every story prompt. Keeping this
+# block byte-identical between requests lets Ollama reuse its KV cache for
+# the prefix, so only the per-story details below need to be processed.
+STORY_PROMPT_PREFIX = """Create a superhero story using the story elements given at the end.
+
+Requirements:
+1. Story should be EXACTLY the requested number of words long
+2. Story should be engaging and appropriate for the target age
+3. Include descriptions of super power usage
+4. Have a clear moral lesson
+5. Include character interactions
+6. Create an exciting conflict and resolution
+
+Format the story as:
+Title: [Story Title]
+
+Story:
+[Main story content]
+
+Moral Lesson:
+[The moral lesson of the story]
+
+Word Count: [Include actual word count at the end]
+"""
+
+STORY_PROMPT_SUFFIX = """
+Story elements:
+Number of words: {word_count}
+Characters: {characters}
+Locations: {locations}
+Theme: {theme}
+Target Age: {target_age}
+"""
+
+# Ollama connection settings. OLLAMA_MODEL can name a quantized tag such as
+# mistral:7b-instruct-q4_K_M for faster decoding on CPU.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "mistral")
+
+# Keep the model (and its prompt cache) loaded between stories; every request
+# passes this so the server's unload timer is refreshed
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "1h")
+OLLAMA_OPTIONS = {"num_ctx": 4096, "num_thread": os.cpu_count()}
+if os.environ.get("OLLAMA_NUM_GPU"):
+    OLLAMA_OPTIONS["num_gpu"] = int(os.environ["OLLAMA_NUM_GPU"])
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
+log = logging.getLogger(__name__)
+
+# Splits the model output into the sections requested by STORY_PROMPT_PREFIX
+_STORY_RE = re.compile(
+    r'Title:\s*(.*?)\n\s*Story:\s*(.*?)\n\s*Moral Lesson:\s*(.*?)(?:\n\s*Word Count:|\Z)',
+    re.DOTALL
+)
+
+# Counts words without building a list of them
+_WORD_RE = re.compile(r'\S+')
+
+# Process-wide counter so every load/save of any generator gets a fresh version
+_UNIVERSE_VERSIONS = itertools.count()
+
+
+@st.cache_data(max_entries=16)
+def _available_characters(universe_version, _universe_data):
+    """Character names for a universe version (data itself is not hashed)"""
+    return list(_universe_data.get('characters', {}).keys())
+
+
+@st.cache_data(max_entries=16)
+def _available_locations(universe_version, _universe_data):
+    """Location names for a universe version (data itself is not hashed)"""
+    return list(_universe_data.get('locations', {}).keys())
+
+
 class StoryGenerator:
     def __init__(self):
         self.universe_file = "universe/universe_data.json"
+        self.story_cache_file = "universe/story_cache.shelve"
+        # _get_generator shares this generator between sessions, whose reruns run on
+        # separate threads; re-entrant because saves refresh and load under it
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
         self.setup_ai()
         self.load_universe()
-        # Initialize stories section if not exists
-        if 'stories' not in self.universe_data:
-            self.universe_data['stories'] = []
 
     def setup_ai(self):
-        st.write("Setting up AI components...")
         try:
-            self.llm = Ollama(model="mistral")
-            st.write("✅ Ollama model initialized")
-            print("✅ Ollama model initialized")
+            # Sync client for streaming a single story into the page
+            self.client = ollama.Client(host=OLLAMA_HOST)
         except Exception as e:
             st.error(f"Failed to initialize Ollama: {str(e)}")
             raise e
+
+        # Load the model weights now so the first story doesn't pay the cold start;
+        # an empty prompt makes Ollama load the model without generating
+        try:
+            self.client.generate(model=OLLAMA_MODEL, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+        except Exception as e:
+            log.warning("Could not preload Ollama model %s: %s", OLLAMA_MODEL, e)
         
-        # Story generation prompt template
+        # Per-story details, appended after the fixed STORY_PROMPT_PREFIX
         self.story_prompt = PromptTemplate(
             input_variables=["characters", "locations", "theme", "target_age", "word_count"],
-            template="""
-            Create a superhero story with exactly {word_count} words using these elements:
-            
-            Characters: {characters}
-            Locations: {locations}
-            Theme: {theme}
-            Target Age: {target_age}
-
-            Requirements:
-            1. Story should be EXACTLY {word_count} words long
-            2. Story should be engaging and appropriate for the target age
-            3. Include descriptions of super power usage
-            4. Have a clear moral lesson
-            5. Include character interactions
-            6. Create an exciting conflict and resolution
-            
-            Format the story as:
-            Title: [Story Title]
-            
-            Story:
-            [Main story content]
-            
-            Moral Lesson:
-            [The moral lesson of the story]
-
-            Word Count: [Include actual word count at the end]
-            """
+            template=STORY_PROMPT_SUFFIX
         )
-        st.write("✅ Prompt template created")
-        print("✅ Prompt template created")
+        log.debug("Ollama clients and prompt template ready (host=%s, model=%s)", OLLAMA_HOST, OLLAMA_MODEL)
 
     def load_universe(self):
         """Load universe data"""
-        st.write(f"Loading universe data from {self.universe_file}")
+        with self._lock:
+            self._load_universe_locked()
+
+    def _load_universe_locked(self):
+        """Load universe data; the caller holds the lock"""
         if os.path.exists(self.universe_file):
             try:
-                with open(self.universe_file, 'r') as f:
-                    self.universe_data = json.load(f)
-                st.write(f"✅ Universe data loaded successfully")
-                print(f"✅ Universe data loaded successfully")
-                st.write(f"Found {len(self.universe_data.get('characters', {}))} characters")
-                print(f"Found {len(self.universe_data.get('characters', {}))} characters")
-                st.write(f"Found {len(self.universe_data.get('locations', {}))} locations")
-                print(f"Found {len(self.universe_data.get('locations', {}))} locations")
+                # Stat before reading so a write landing mid-load still counts as a change later
+                mtime = os.path.getmtime(self.universe_file)
+                # Parse straight from the mapped file pages instead of reading into a str first
+                with open(self.universe_file, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                        memoryview(mm) as view:
+                    universe_data = orjson.loads(view)
+                self.universe_data = universe_data
+                self._loaded_mtime = mtime
+                log.debug(
+                    "Loaded %s: %d characters, %d locations",
+                    self.universe_file,
+                    len(self.universe_data.get('characters', {})),
+                    len(self.universe_data.get('locations', {}))
+                )
+                self._ensure_appearance_lists()
             except Exception as e:
                 st.error(f"Error loading universe data: {str(e)}")
-                self.universe_data = {'characters': {}, 'locations': {}}
+                self._keep_or_empty_universe()
         else:
             st.error("Universe data not found. Please create universe first using universe_builder.py")
+            self._keep_or_empty_universe()
+        # Initialize stories section if not exists
+        if 'stories' not in self.universe_data:
+            self.universe_data['stories'] = []
+        self._build_indices()
+        self._universe_version = next(_UNIVERSE_VERSIONS)
+
+    def _keep_or_empty_universe(self):
+        """Fall back to an empty universe, unless one was already loaded"""
+        # The generator is shared by every session, so a failed reload must not
+        # wipe the universe they are all working with
+        if not hasattr(self, 'universe_data'):
             self.universe_data = {'characters': {}, 'locations': {}}
 
+    def refresh_if_changed(self):
+        """Reload the universe if another tool changed the file since it was loaded or saved"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.universe_file)
+            except OSError:
+                return
+            if mtime != self._loaded_mtime:
+                self._load_universe_locked()
+
+    def _ensure_appearance_lists(self):
+        """Give every character and location a story_appearances list up front"""
+        for collection in ('characters', 'locations'):
+            for data in self.universe_data.get(collection, {}).values():
+                if isinstance(data, dict):
+                    data.setdefault('story_appearances', [])
+
+    def _write_universe(self):
+        """Write the whole universe file"""
+        if os.environ.get("UNIVERSE_PRETTY"):
+            # Human-diffable output for debugging
+            payload = json.dumps(self.universe_data, indent=2).encode()
+        else:
+            payload = orjson.dumps(self.universe_data)
+        # Swap the file in whole so the other tools never read a half-written universe
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.universe_file) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.universe_file)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        # Memory already matches what was written; no reload needed
+        self._loaded_mtime = os.path.getmtime(self.universe_file)
+
+    def _build_indices(self):
+        """Build ID lookups for characters, locations and stories"""
+        self._char_by_id = {
+            data['id']: name for name, data in self.universe_data.get('characters', {}).items()
+            if isinstance(data, dict) and 'id' in data
+        }
+        self._loc_by_id = {
+            data['id']: name for name, data in self.universe_data.get('locations', {}).items()
+            if isinstance(data, dict) and 'id' in data
+        }
+        self._story_by_id = {
+            story['id']: story for story in self.universe_data.get('stories', [])
+            if 'id' in story
+        }
+
+        # Highest sequence number used per ID prefix and day
+        self._id_counters = {}
+        for prefix, collection in (
+            ("CHAR", self.universe_data.get('characters', {}).values()),
+            ("LOC", self.universe_data.get('locations', {}).values()),
+            ("STORY", self.universe_data.get('stories', []))
+        ):
+            for entity in collection:
+                if isinstance(entity, dict):
+                    self._note_id(prefix, entity.get('id', ''))
+
+    def _note_id(self, prefix, entity_id):
+        """Track the sequence number of an existing ID for generate_id"""
+        if not entity_id.startswith(prefix):
+            return
+        day_prefix = entity_id[:len(prefix) + 8]
+        try:
+            sequence = int(entity_id[-5:])
+        except ValueError:
+            return
+        self._id_counters[day_prefix] = max(self._id_counters.get(day_prefix, 0), sequence)
+
     def get_available_characters(self):
         """Get list of available characters"""
-        return list(self.universe_data.get('characters', {}).keys())
+        return _available_characters(self._universe_version, self.universe_data)
 
     def get_available_locations(self):
         """Get list of available locations"""
-        return list(self.universe_data.get('locations', {}).keys())
+        return _available_locations(self._universe_version, self.universe_data)
+
+    def generation_options(self, word_count):
+        """Get Ollama options for a story of the given length"""
+        # Cap output tokens with headroom for the title, moral and word count line
+        return {**OLLAMA_OPTIONS, "num_predict": int(word_count) * 2}
 
     def count_words(self, text):
         """Count words in text"""
-        return len(text.split())
+        return sum(1 for _ in _WORD_RE.finditer(text))
+
+    def _story_cache_keys(self, prompt, selected_characters, selected_locations, theme, target_age, word_count):
+        """Build the exact and structural cache keys for a story request"""
+        exact_key = hashlib.blake2b(prompt.encode('utf-8')).hexdigest()
+        # Structural key ignores which characters/locations fill the slots
+        template = (theme, target_age, word_count, len(selected_characters), len(selected_locations))
+        structural_key = hashlib.blake2b(repr(template).encode('utf-8')).hexdigest()
+        return exact_key, structural_key
+
+    def _slot_names(self, selected_characters, selected_locations):
+        """Map each selected name to its {{CHAR_n}}/{{LOC_n}} placeholder"""
+        slots = {name: f"{{{{CHAR_{i}}}}}" for i, name in enumerate(selected_characters)}
+        slots.update({name: f"{{{{LOC_{i}}}}}" for i, name in enumerate(selected_locations)})
+        return slots
+
+    def _templatize_story(self, story, selected_characters, selected_locations):
+        """Replace selected names in a story with slot placeholders"""
+        slots = self._slot_names(selected_characters, selected_locations)
+        # Longest names first so "Minnal Ammu" wins over a shorter overlapping name
+        for name in sorted(slots, key=len, reverse=True):
+            story = re.sub(rf"\b{re.escape(name)}\b", slots[name], story)
+        return story
+
+    def _fill_story_template(self, template, selected_characters, selected_locations):
+        """Substitute slot placeholders with the selected names"""
+        for name, placeholder in self._slot_names(selected_characters, selected_locations).items():
+            template = template.replace(placeholder, name)
+        return template
+
+    def get_cached_story(self, prompt, selected_characters, selected_locations, theme, target_age, word_count):
+        """Return a cached story for this request, or None on a cache miss"""
+        exact_key, structural_key = self._story_cache_keys(
+            prompt, selected_characters, selected_locations, theme, target_age, word_count
+        )
+        try:
+            with shelve.open(self.story_cache_file, flag='r') as cache:
+                if exact_key in cache:
+                    return cache[exact_key]
+                if structural_key in cache:
+                    return self._fill_story_template(cache[structural_key], selected_characters, selected_locations)
+        except Exception:
+            # Cache file missing or unreadable - treat as a miss
+            pass
+        return None
 
-    def generate_story(self, selected_characters, selected_locations, theme, target_age, word_count):
-        """Generate a story using the selected elements"""
-        st.write("Starting story generation...")
+    def cache_story(self, story, prompt, selected_characters, selected_locations, theme, target_age, word_count):
+        """Store a generated story under its exact and structural keys"""
+        if not _STORY_RE.search(story):
+            # Don't serve a malformed response again on every retry
+            log.debug("Not caching story that does not parse")
+            return
+        exact_key, structural_key = self._story_cache_keys(
+            prompt, selected_characters, selected_locations, theme, target_age, word_count
+        )
+        template = self._templatize_story(story, selected_characters, selected_locations)
+        # Names the model shortened ("Ammu" for "Minnal Ammu") are not replaced by
+        # _templatize_story and would leak into other requests of the same shape
+        name_words = {word for name in (*selected_characters, *selected_locations) for word in name.split()}
+        leaks_names = any(re.search(rf"\b{re.escape(word)}\b", template) for word in name_words)
         try:
-            # Get character details
-            st.write("Processing character details...")
-            character_details = []
-            for char in selected_characters:
-                powers = self.universe_data['characters'][char].get('powers', [])
-                desc = self.universe_data['characters'][char].get('description', '')
-                character_details.append(f"{char} ({', '.join(powers)})")
-            st.write(f"✅ Processed {len(character_details)} characters")
-            print(f"✅ Processed {len(character_details)} characters")
-
-            # Get location details
-            st.write("Processing location details...")
-            location_details = []
-            for loc in selected_locations:
-                desc = self.universe_data['locations'][loc].get('description', '')
-                location_details.append(f"{loc}: {desc}")
-            st.write(f"✅ Processed {len(location_details)} locations")
-            print(f"✅ Processed {len(location_details)} locations")
-
-            # Generate story
-            st.write("Preparing prompt...")
-            prompt = self.story_prompt.format(
-                characters="\n".join(character_details),
-                locations="\n".join(location_details),
-                theme=theme,
-                target_age=target_age,
-                word_count=word_count
-            )
-            st.write("✅ Prompt prepared")
-            print("✅ Prompt prepared")
-
-            st.write("Sending prompt to Ollama...")
-            # Test Ollama connection before generating
-            # test_response = self.llm("Hello")
-            # st.write("✅ Ollama test response received")
-            # print("✅ Ollama test response received")
-            
-            # Generate actual story
-            st.write("Generating story...")
-            story = self.llm(prompt)
-            st.write("✅ Story generated successfully")
-            print("✅ Story generated successfully")
-            print(story)
-            return story
+            with shelve.open(self.story_cache_file) as cache:
+                cache[exact_key] = story
+                if not leaks_names:
+                    cache[structural_key] = template
+        except Exception as e:
+            log.warning("Could not write story cache: %s", e)
+
+    def _resolve_chars(self, names):
+        """Pair each character name with its universe entry"""
+        characters = self.universe_data['characters']
+        return [(name, characters[name]) for name in names]
+
+    def _resolve_locs(self, names):
+        """Pair each location name with its universe entry"""
+        locations = self.universe_data['locations']
+        return [(name, locations[name]) for name in names]
+
+    def build_prompt(self, selected_characters, selected_locations, theme, target_age, word_count):
+        """Build the story prompt for the selected elements"""
+        character_details = [
+            f"{name} ({', '.join(data.get('powers', []))})"
+            for name, data in self._resolve_chars(selected_characters)
+        ]
+        location_details = [
+            f"{name}: {data.get('description', '')}"
+            for name, data in self._resolve_locs(selected_locations)
+        ]
+
+        prompt = STORY_PROMPT_PREFIX + self.story_prompt.format(
+            characters="\n".join(character_details),
+            locations="\n".join(location_details),
+            theme=theme,
+            target_age=target_age,
+            word_count=word_count
+        )
+        log.debug(
+            "Prompt prepared with %d characters and %d locations",
+            len(character_details), len(location_details)
+        )
+        return prompt
+
+    def stream_story(self, selected_characters, selected_locations, theme, target_age, word_count,
+                     use_cache=True, status=None):
+        """Generate a story, yielding text as the model produces it
+
+        If a status dict is given, status['cached'] tells whether the story came from the
+        cache and status['error'] holds the error message of a failed generation (the text
+        yielded before the failure is incomplete). Without one, errors are raised.
+        """
+        if status is not None:
+            status['cached'] = False
+            status['error'] = None
+        try:
+            prompt = self.build_prompt(selected_characters, selected_locations, theme, target_age, word_count)
+
+            if use_cache:
+                story = self.get_cached_story(
+                    prompt, selected_characters, selected_locations, theme, target_age, word_count
+                )
+                if story:
+                    log.debug("Story loaded from cache")
+                    if status is not None:
+                        status['cached'] = True
+                    yield story
+                    return
+
+            chunks = []
+            for chunk in self.client.generate(
+                model=OLLAMA_MODEL,
+                prompt=prompt,
+                options=self.generation_options(word_count),
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                stream=True
+            ):
+                chunks.append(chunk['response'])
+                yield chunk['response']
+
+            story = "".join(chunks)
+            self.cache_story(story, prompt, selected_characters, selected_locations, theme, target_age, word_count)
+            log.debug("Story generated (%d chars)", len(story))
 
         except Exception as e:
-            st.error(f"Error generating story: {str(e)}")
-            st.error("Full error details:", exc_info=True)
-            return None
+            log.exception("Story generation failed")
+            if status is None:
+                raise
+            # Reported by the caller: st.error here would land in the stream's
+            # placeholder, which is cleared as soon as the stream ends
+            status['error'] = str(e)
         
     def save_story_to_universe(self, story_data, metadata):
         """Save generated story to universe"""
-        st.write("Saving story to universe...")
-        
+        with self._lock:
+            # Start from the file on disk so Universe Builder edits made since the
+            # last load aren't overwritten, then reserve the ID and write under the lock
+            self.refresh_if_changed()
+            return self._save_story_locked(story_data, metadata)
+
+    def _save_story_locked(self, story_data, metadata):
+        """Save generated story to universe; the caller holds the lock"""
         # Generate story ID
         story_id = self.generate_id("STORY")
+        resolved_chars = self._resolve_chars(metadata['characters'])
+        resolved_locs = self._resolve_locs(metadata['locations'])
         
         story_entry = {
             'id': story_id,
@@ -161,13 +429,11 @@ class StoryGenerator:
                 'theme': metadata['theme'],
                 'target_age': metadata['target_age'],
                 'word_count': metadata['word_count'],
-                'characters_used': [self.universe_data['characters'][char]['id'] for char in metadata['characters']],
-                'locations_used': [self.universe_data['locations'][loc]['id'] for loc in metadata['locations']]
+                'characters_used': [data['id'] for _, data in resolved_chars],
+                'locations_used': [data['id'] for _, data in resolved_locs]
             }
         }
         
-        print(f"Created story entry with ID: {story_id}")
-        
         # Add to universe data
         if 'stories' not in self.universe_data:
             self.universe_data['stories'] = []
@@ -175,34 +441,36 @@ class StoryGenerator:
         # Only save if we have actual content
         if story_entry['title'] and story_entry['content']:
             self.universe_data['stories'].append(story_entry)
+            self._record_appearances(story_id, resolved_chars, resolved_locs)
             
-            # Update character references with story ID
-            for char in metadata['characters']:
-                char_data = self.universe_data['characters'][char]
-                if 'story_appearances' not in char_data:
-                    char_data['story_appearances'] = []
-                char_data['story_appearances'].append(story_id)
-            
-            # Update location references with story ID
-            for loc in metadata['locations']:
-                loc_data = self.universe_data['locations'][loc]
-                if 'story_appearances' not in loc_data:
-                    loc_data['story_appearances'] = []
-                loc_data['story_appearances'].append(story_id)
-            
-            # Save updated universe
+            # One atomic write per save, so the ID shown to the user can be found
+            # by the image generator and story composer straight away
             try:
-                with open(self.universe_file, 'w') as f:
-                    json.dump(self.universe_data, f, indent=2)
-                st.write("✅ Story saved to universe successfully")
-                return story_id  # Return story_id instead of True
+                self._write_universe()
             except Exception as e:
+                # Take the story back out so memory keeps matching the file
+                self.universe_data['stories'].pop()
+                for _, data in itertools.chain(resolved_chars, resolved_locs):
+                    data['story_appearances'].remove(story_id)
                 st.error(f"Error saving to file: {str(e)}")
                 return None  # Return None instead of False
+            
+            self._story_by_id[story_id] = story_entry
+            self._note_id("STORY", story_id)
+            self._universe_version = next(_UNIVERSE_VERSIONS)
+            log.debug("Story %s saved to %s", story_id, self.universe_file)
+            return story_id  # Return story_id instead of True
         else:
             st.warning("Story not saved: Missing title or content")
             return False
 
+    def _record_appearances(self, story_id, characters, locations):
+        """Add a story ID to the appearances of resolved (name, entry) characters and locations"""
+        # story_appearances always exists after load (see _ensure_appearance_lists),
+        # so this is a plain append per entity
+        for _, data in itertools.chain(characters, locations):
+            data['story_appearances'].append(story_id)
+
     def get_character_stories(self, character_name):
         """Get all stories featuring a character"""
         if character_name in self.universe_data['characters']:
@@ -217,24 +485,15 @@ class StoryGenerator:
     
     def get_character_by_id(self, char_id):
         """Get character name by ID"""
-        for name, data in self.universe_data['characters'].items():
-            if data.get('id') == char_id:
-                return name
-        return None
+        return self._char_by_id.get(char_id)
 
     def get_location_by_id(self, loc_id):
         """Get location name by ID"""
-        for name, data in self.universe_data['locations'].items():
-            if data.get('id') == loc_id:
-                return name
-        return None
+        return self._loc_by_id.get(loc_id)
 
     def get_story_by_id(self, story_id):
         """Get story by ID"""
-        for story in self.universe_data['stories']:
-            if story.get('id') == story_id:
-                return story
-        return None
+        return self._story_by_id.get(story_id)
 
     def generate_id(self, prefix, year=None, month=None, day=None, sequence=None):
         """Generate ID with specified format"""
@@ -244,35 +503,31 @@ class StoryGenerator:
             month = now.month
             day = now.day
             
-        # Get latest sequence number for the day
+        # Next sequence number for the day, from the counters kept by _note_id
         if not sequence:
-            existing_ids = []
-            if prefix == "CHAR":
-                existing_ids = [char_data['id'] for char_data in self.universe_data['characters'].values()]
-            elif prefix == "LOC":
-                existing_ids = [loc_data['id'] for loc_data in self.universe_data['locations'].values()]
-            elif prefix == "STORY":
-                existing_ids = [story.get('id', '') for story in self.universe_data['stories']]
-            
-            # Filter IDs for the current day
-            today_prefix = f"{prefix}{year}{month:02d}{day:02d}"
-            today_ids = [id for id in existing_ids if id.startswith(today_prefix)]
-            
-            if today_ids:
-                # Get the highest sequence number
-                sequence = max([int(id[-5:]) for id in today_ids]) + 1
-            else:
-                sequence = 1
+            with self._lock:
+                today_prefix = f"{prefix}{year}{month:02d}{day:02d}"
+                sequence = self._id_counters.get(today_prefix, 0) + 1
+                # Reserve the number so a concurrent save can't be handed the same ID
+                self._id_counters[today_prefix] = sequence
 
         return f"{prefix}{year}{month:02d}{day:02d}{sequence:05d}"
 
 
+@st.cache_resource
+def _get_generator():
+    """Build the story generator once instead of on every rerun"""
+    return StoryGenerator()
+
+
 def main():
     st.set_page_config(page_title="MinnalAmmu Story Generator", layout="wide")
     st.title("⚡ MinnalAmmu Story Generator")
 
     # Initialize story generator
-    generator = StoryGenerator()
+    generator = _get_generator()
+    # Pick up characters, locations and stories added by other tools since the last rerun
+    generator.refresh_if_changed()
     
     # Check if universe has content
     if not generator.get_available_characters():
@@ -323,6 +578,14 @@ def main():
             help="Choose how many words you want in your story"
         )
 
+        # Reuse stories generated earlier for the same (or same-shaped) request
+        use_cache = st.checkbox(
+            "Reuse cached stories",
+            value=False,
+            help="Show a story generated earlier for the same (or same-shaped) request "
+                 "instead of calling the model; reused stories are not saved again"
+        )
+
         # Generate button
         generate_story = st.form_submit_button("Generate Story")
 
@@ -332,13 +595,25 @@ def main():
             st.error("Please select at least one character and one location!")
         else:
             with st.spinner("Generating your story..."):
-                story = generator.generate_story(
-                    selected_characters,
-                    selected_locations,
-                    theme,
-                    target_age,
-                    word_count
-                )
+                # Show the story as it is generated; the formatted view below
+                # replaces it once the full text is available
+                stream_placeholder = st.empty()
+                stream_status = {}
+                with stream_placeholder.container():
+                    story = st.write_stream(generator.stream_story(
+                        selected_characters,
+                        selected_locations,
+                        theme,
+                        target_age,
+                        word_count,
+                        use_cache=use_cache,
+                        status=stream_status
+                    ))
+                stream_placeholder.empty()
+                if stream_status['error']:
+                    # Don't show or save the partial text of a failed stream
+                    st.error(f"Error generating story: {stream_status['error']}")
+                    story = None
 
                 # story = """
                 #         Title: "Minnal Ammu's Sunny Playdate"
@@ -355,44 +630,12 @@ def main():
                 #         """
                 
                 if story:
-                    # Initialize variables
-                    title = ""
-                    story_text = ""
-                    moral = ""
-                    
                     # Parse story sections
-                    sections = story.split('\n\n')
-                    
-                    # Extract title, story, and moral first
-                    story_section = False
-                    story_content = []
-                    
-                    print(f"************** Story sections: {sections}")
-                    for section in sections:
-                        section = section.strip()
-                        print(f"------- Processing section: {section}")
-                        print(f"------- Processing section: {section.strip()}")
-                        if section.strip().startswith('Title:'):
-                            print(f"---Found title section")
-                            title = section.replace('Title:', '').strip()
-                            print(f"---Title: {title}")
-                        elif section.startswith('Story:'):
-                            print(f"---Found story section")
-                            print(f"---Story section: {section}")
-                            story_section = True
-                            #continue
-                            #story_text = section.replace('Story:', '').strip()
-                        elif section.startswith('Moral Lesson:'):
-                            print(f"---Found moral section")
-                            story_section = False
-                            moral = section.replace('Moral Lesson:', '').strip()
-                            print(f"---Moral: {moral}")
-                        
-                        if story_section:
-                            print(f"---Adding to story content: {section}")
-                            story_content.append(section)
-
-                    story_text = '\n\n'.join(story_content)
+                    match = _STORY_RE.search(story)
+                    if match:
+                        title, story_text, moral = (part.strip() for part in match.groups())
+                    else:
+                        title, story_text, moral = "", story.strip(), ""
 
                     # Create tabs for different viewing options
                     story_tab, raw_tab = st.tabs(["📖 Formatted Story", "🔍 Raw Output"])
@@ -412,11 +655,10 @@ def main():
                             'moral': moral  # Clean the moral lesson
                         }
 
-                        # Add debug prints
-                        print(f"Prepared story data:")
-                        print(f"Title: {story_data['title']}")
-                        print(f"Story length: {len(story_data['story'])}")
-                        print(f"Moral length: {len(story_data['moral'])}")
+                        log.debug(
+                            "Prepared story data: title=%r, story length=%d, moral length=%d",
+                            story_data['title'], len(story_data['story']), len(story_data['moral'])
+                        )
                         
                         metadata = {
                             'theme': theme,
@@ -470,8 +712,13 @@ def main():
                                 st.markdown("### Moral Lesson")
                                 st.info(moral)
 ####
-                            # Save and show detailed statistics
-                            story_id = generator.save_story_to_universe(story_data, metadata)
+                            # Save and show detailed statistics; a cached story is already in
+                            # the universe (or was never saved) and must not get a new ID
+                            if stream_status.get('cached'):
+                                st.info("♻️ Reused a cached story - not saved to the universe again")
+                                story_id = None
+                            else:
+                                story_id = generator.save_story_to_universe(story_data, metadata)
                             if story_id:  # Check for story_id instead of True
                                 st.success(f"✨ Story saved to universe! (ID: {story_id})")
                                 
@@ -480,6 +727,10 @@ def main():
                                 
                                 with stats_tab1:
                                     st.markdown("### Character Statistics")
+                                    # Look up each story once, however many selected characters share it
+                                    needed_ids = {sid for c in selected_characters
+                                                  for sid in generator.get_character_stories(c)}
+                                    stories_for_display = {sid: generator.get_story_by_id(sid) for sid in needed_ids}
                                     for char in selected_characters:
                                         char_data = generator.universe_data['characters'][char]
                                         char_stories = generator.get_character_stories(char)
@@ -499,19 +750,22 @@ def main():
                                         if char_stories:
                                             st.write("Story Appearances:")
                                             for story_id in char_stories:
-                                                story = generator.get_story_by_id(story_id)
-                                                if story:
-                                                    st.markdown(f"**{story['title']}** ({story_id})")
+                                                appearance = stories_for_display[story_id]
+                                                if appearance:
+                                                    st.markdown(f"**{appearance['title']}** ({story_id})")
                                                     st.markdown(f"""
-                                                        - Theme: {story['metadata']['theme']}
-                                                        - Target Age: {story['metadata']['target_age']}
-                                                        - Word Count: {story['metadata']['word_count']}
-                                                        - Generated: {story['metadata']['generated_date']}
+                                                        - Theme: {appearance['metadata']['theme']}
+                                                        - Target Age: {appearance['metadata']['target_age']}
+                                                        - Word Count: {appearance['metadata']['word_count']}
+                                                        - Generated: {appearance['metadata']['generated_date']}
                                                     """)
                                         st.markdown("---")  # Add separator between characters
                                 
                                 with stats_tab2:
                                     st.markdown("### Location Statistics")
+                                    loc_needed_ids = {sid for loc in selected_locations
+                                                      for sid in generator.get_location_stories(loc)}
+                                    loc_stories_for_display = {sid: generator.get_story_by_id(sid) for sid in loc_needed_ids}
                                     for loc in selected_locations:
                                         loc_data = generator.universe_data['locations'][loc]
                                         loc_stories = generator.get_location_stories(loc)
@@ -530,11 +784,11 @@ def main():
                                         if loc_stories:
                                             st.write("Featured in Stories:")
                                             for story_id in loc_stories:
-                                                story = generator.get_story_by_id(story_id)
-                                                if story:
-                                                    st.markdown(f"**{story['title']}** ({story_id})")
+                                                appearance = loc_stories_for_display[story_id]
+                                                if appearance:
+                                                    st.markdown(f"**{appearance['title']}** ({story_id})")
                                                     st.markdown("Characters in this story:")
-                                                    for char_id in story['metadata']['characters_used']:
+                                                    for char_id in appearance['metadata']['characters_used']:
                                                         char_name = generator.get_character_by_id(char_id)
                                                         if char_name:
                                                             st.write(f"  • {char_name}")
@@ -542,8 +796,7 @@ def main():
 
                                     # Overall location statistics
                                     st.markdown("### Location Overview")
-                                    total_stories = len(set([story_id for loc in selected_locations 
-                                                           for story_id in generator.get_location_stories(loc)]))
+                                    total_stories = len(loc_needed_ids)
                                     st.write(f"Total unique stories featuring selected locations: {total_stories}")
 ####
                     with raw_tab:
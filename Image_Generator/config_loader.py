@@ -1,7 +1,19 @@
 import configparser
+import copy
 import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Set
+
+# Directories already created (or found) by this process
+_ensured_dirs: Set[str] = set()
+
+def ensure_dir(path) -> None:
+    """Create a directory (and parents) once per process"""
+    path = str(path)
+    if path in _ensured_dirs:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ensured_dirs.add(path)
 
 class ConfigLoader:
     def __init__(self, config_path: str = "config.ini"):
@@ -10,89 +22,94 @@ class ConfigLoader:
         Args:
             config_path: Path to the config.ini file
         """
-        self.config = configparser.ConfigParser()
         self.config_path = config_path
-        self._load_config()
+        self._snapshot = self._load_config()
         self._setup_directories()
 
-    def _load_config(self):
-        """Load configuration from INI file"""
+    def _load_config(self) -> Dict[str, Dict]:
+        """Load configuration from INI file into a typed dictionary"""
         if not os.path.exists(self.config_path):
             raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
         
-        self.config.read(self.config_path)
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
         
         # Convert relative paths to absolute paths based on config file location
         base_dir = Path(self.config_path).parent.absolute()
         
-        # Update paths in config
-        self.config['MODEL']['path'] = str(base_dir / self.config['MODEL']['path'])
-        self.config['DATA']['universe_data_path'] = str(base_dir / self.config['DATA']['universe_data_path'])
-        self.config['OUTPUT']['base_dir'] = str(base_dir / self.config['OUTPUT']['base_dir'])
-        self.config['OUTPUT']['story_images_dir'] = str(base_dir / self.config['OUTPUT']['story_images_dir'])
+        # Parse and type-convert every value once; the parser is not kept
+        return {
+            'model': {
+                'path': str(base_dir / config['MODEL']['path']),
+                'default_size': config.getint('MODEL', 'default_size'),
+                'max_size': config.getint('MODEL', 'max_size'),
+                'min_size': config.getint('MODEL', 'min_size'),
+                'size_step': config.getint('MODEL', 'size_step')
+            },
+            'data': {
+                'universe_data_path': str(base_dir / config['DATA']['universe_data_path']),
+                'eager_load': config.getboolean('DATA', 'eager_load', fallback=True)
+            },
+            'output': {
+                'base_dir': str(base_dir / config['OUTPUT']['base_dir']),
+                'story_images_dir': str(base_dir / config['OUTPUT']['story_images_dir']),
+                'image_format': config.get('OUTPUT', 'image_format', fallback='png').strip().lower(),
+                'png_compress_level': config.getint('OUTPUT', 'png_compress_level', fallback=1)
+            },
+            'pipeline': {
+                'num_inference_steps': config.getint('PIPELINE', 'num_inference_steps'),
+                'guidance_scale': config.getfloat('PIPELINE', 'guidance_scale'),
+                'num_images_per_prompt': config.getint('PIPELINE', 'num_images_per_prompt'),
+                'compile_unet': config.getboolean('PIPELINE', 'compile_unet', fallback=False),
+                'quantization': config.get('PIPELINE', 'quantization', fallback='none').strip().lower(),
+                'auto_turbo': config.getboolean('PIPELINE', 'auto_turbo', fallback=True),
+                'batch_size': config.getint('PIPELINE', 'batch_size', fallback=4),
+                'free_text_encoders': config.getboolean('PIPELINE', 'free_text_encoders', fallback=False)
+            },
+            'style': {
+                'base_style': config['STYLE']['base_style'],
+                'quality_boost': config['STYLE']['quality_boost'],
+                'weights': {
+                    'main_prompt': config.getfloat('WEIGHTS', 'main_prompt'),
+                    'style': config.getfloat('WEIGHTS', 'style'),
+                    'scene': config.getfloat('WEIGHTS', 'scene'),
+                    'quality': config.getfloat('WEIGHTS', 'quality')
+                }
+            }
+        }
 
     def _setup_directories(self):
         """Create necessary directories"""
         directories = [
-            self.config['MODEL']['path'],
-            os.path.dirname(self.config['DATA']['universe_data_path']),
-            self.config['OUTPUT']['base_dir'],
-            self.config['OUTPUT']['story_images_dir']
+            self._snapshot['model']['path'],
+            os.path.dirname(self._snapshot['data']['universe_data_path']),
+            self._snapshot['output']['base_dir'],
+            self._snapshot['output']['story_images_dir']
         ]
         
         for directory in directories:
-            os.makedirs(directory, exist_ok=True)
+            ensure_dir(directory)
 
     def get_model_config(self) -> Dict[str, Any]:
         """Get model configuration"""
-        return {
-            'path': self.config['MODEL']['path'],
-            'default_size': self.config.getint('MODEL', 'default_size'),
-            'max_size': self.config.getint('MODEL', 'max_size'),
-            'min_size': self.config.getint('MODEL', 'min_size'),
-            'size_step': self.config.getint('MODEL', 'size_step')
-        }
+        return copy.copy(self._snapshot['model'])
 
     def get_data_config(self) -> Dict[str, str]:
         """Get data configuration"""
-        return {
-            'universe_data_path': self.config['DATA']['universe_data_path']
-        }
+        return copy.copy(self._snapshot['data'])
 
     def get_output_config(self) -> Dict[str, str]:
         """Get output configuration"""
-        return {
-            'base_dir': self.config['OUTPUT']['base_dir'],
-            'story_images_dir': self.config['OUTPUT']['story_images_dir']
-        }
+        return copy.copy(self._snapshot['output'])
 
     def get_pipeline_config(self) -> Dict[str, Any]:
         """Get pipeline configuration"""
-        return {
-            'num_inference_steps': self.config.getint('PIPELINE', 'num_inference_steps'),
-            'guidance_scale': self.config.getfloat('PIPELINE', 'guidance_scale'),
-            'num_images_per_prompt': self.config.getint('PIPELINE', 'num_images_per_prompt')
-        }
+        return copy.copy(self._snapshot['pipeline'])
 
     def get_style_config(self) -> Dict[str, Any]:
         """Get style configuration"""
-        return {
-            'base_style': self.config['STYLE']['base_style'],
-            'quality_boost': self.config['STYLE']['quality_boost'],
-            'weights': {
-                'main_prompt': self.config.getfloat('WEIGHTS', 'main_prompt'),
-                'style': self.config.getfloat('WEIGHTS', 'style'),
-                'scene': self.config.getfloat('WEIGHTS', 'scene'),
-                'quality': self.config.getfloat('WEIGHTS', 'quality')
-            }
-        }
+        return copy.deepcopy(self._snapshot['style'])
 
     def get_all_config(self) -> Dict[str, Dict]:
         """Get all configurations"""
-        return {
-            'model': self.get_model_config(),
-            'data': self.get_data_config(),
-            'output': self.get_output_config(),
-            'pipeline': self.get_pipeline_config(),
-            'style': self.get_style_config()
-        }
\ No newline at end of file
+        return self._snapshot
\ No newline at end of file
@@ -1,15 +1,37 @@
 import os
-import torch
+import re
+import sys
+import threading
 import gc
-from diffusers import AutoPipelineForText2Image
+from concurrent.futures import Future, ThreadPoolExecutor
 import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple, List
-import json
+from typing import Dict, Optional, Tuple, List, TYPE_CHECKING
+import pickle
+import orjson
 from datetime import datetime
-from config_loader import ConfigLoader
+from config_loader import ConfigLoader, ensure_dir
 import argparse
 
+# torch, diffusers and transformers take seconds to import, so they are imported
+# where the pipeline is first needed; --help and unknown story IDs never pay for it
+if TYPE_CHECKING:
+    from diffusers import AutoPipelineForText2Image
+
+# Pipelines already loaded in this process, keyed by (model_path, dtype, device),
+# so repeated builders/generations don't reload the weights from disk
+_PIPELINE_CACHE: Dict[tuple, "AutoPipelineForText2Image"] = {}
+_PIPELINE_LOCK = threading.Lock()
+
+# Distilled checkpoints (matched against model path / scheduler name) and the
+# most inference steps worth running for each (SDXL-Turbo 1-4, LCM 2-8);
+# they are run without CFG
+_FAST_CHECKPOINT_STEPS = {"turbo": 4, "lcm": 8}
+
+# One pass over the text finds every keyword the prompt helpers care about
+_SCENE_RE = re.compile(r"night|evening|sunset|morning|rain|storm|cloud")
+_FEATURE_RE = re.compile(r"indian|brown skin")
+
 class MinmalAmmuImageBuilder:
     def __init__(self, config: Dict[str, Dict]):
         """
@@ -21,30 +43,186 @@ class MinmalAmmuImageBuilder:
         self.config = config
         self.model_path = config['model']['path']
         self.default_size = config['model']['default_size']
+        self._min_size = config['model']['min_size']
+        self._max_size = config['model']['max_size']
+        self._size_step = config['model']['size_step']
         
-        # Load universe data first
-        self.universe_data = self._load_universe_data(config['data']['universe_data_path'])
+        # Load universe data first; without eager_load only characters and locations
+        # are read up front and stories are streamed from the file when requested
+        self.universe_data_path = config['data']['universe_data_path']
+        self._eager_load = config['data']['eager_load']
+        # Weighted prompts by story ID; cleared whenever the universe file is reloaded
+        self._prompt_cache: Dict[str, str] = {}
+        self._load_universe()
+        self._prompt_template = self._build_prompt_template(config['style'])
         
         # Pipeline is initialized only when needed
         self.pipeline = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._fast_checkpoint = None
+        
+        # Images are encoded and written in the background while the next batch runs
+        self._io_executor = ThreadPoolExecutor(max_workers=2)
+        self._image_format = config['output']['image_format']
+        if self._image_format == "webp":
+            self._save_options = {"format": "WEBP", "quality": 95, "method": 0}
+        elif self._image_format == "png":
+            self._save_options = {
+                "format": "PNG",
+                "compress_level": config['output']['png_compress_level'],
+                "optimize": False
+            }
+        else:
+            raise Exception(f"Unsupported image format: {self._image_format}")
+        self._pending_saves: List[Future] = []
+        
+        # Set together with the pipeline
+        self.device = None
+        self._torch_dtype = None
+
+    def _load_universe(self):
+        """(Re)load the universe file and rebuild everything derived from it"""
+        try:
+            # Stat before reading so a save landing mid-load still counts as a change later
+            self._universe_mtime_ns = os.stat(self.universe_data_path).st_mtime_ns
+        except Exception as e:
+            raise Exception(f"Failed to load universe data: {str(e)}")
+        if self._eager_load:
+            self.universe_data = self._load_universe_data(self.universe_data_path)
+        else:
+            self.universe_data = self._load_universe_subtrees(self.universe_data_path)
+        self._build_indices()
+        self._prompt_cache.clear()
+
+    def _universe_changed(self) -> bool:
+        """Check whether the universe file was modified since it was loaded"""
+        try:
+            return os.stat(self.universe_data_path).st_mtime_ns != self._universe_mtime_ns
+        except OSError:
+            return False  # Being replaced right now; a missing story is reported as usual
 
     def _load_universe_data(self, universe_data_path: str) -> Dict:
         """
         Load the universe data from JSON file
         
+        A pickled copy is kept next to the JSON file and reused while the
+        JSON file's modification time is unchanged, skipping the JSON parse.
+        
         Args:
             universe_data_path: Path to the universe data JSON file
             
         Returns:
             Dict containing universe data
         """
+        cache_path = universe_data_path + ".pkl"
+        try:
+            source_mtime = os.stat(universe_data_path).st_mtime_ns
+        except Exception as e:
+            raise Exception(f"Failed to load universe data: {str(e)}")
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_mtime, data = pickle.load(f)
+            if cached_mtime == source_mtime:
+                return data
+        except Exception:
+            pass  # Missing, stale format or corrupt cache - parse the JSON instead
+        
+        try:
+            data = orjson.loads(Path(universe_data_path).read_bytes())
+        except Exception as e:
+            raise Exception(f"Failed to load universe data: {str(e)}")
+        
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump((source_mtime, data), f, protocol=5)
+        except OSError:
+            pass  # Read-only location; the JSON is parsed again next time
+        return data
+
+    def _load_universe_subtrees(self, universe_data_path: str) -> Dict:
+        """
+        Stream the universe data JSON file, keeping only characters and locations
+        
+        Parsing stops once both sections are read, so the stories that follow
+        them in the file are never decoded.
+        
+        Args:
+            universe_data_path: Path to the universe data JSON file
+            
+        Returns:
+            Dict containing characters, locations and an empty stories list
+        """
+        import ijson
+        
+        data = {"characters": {}, "locations": {}, "stories": []}
+        wanted = {"characters", "locations"}
+        try:
+            with open(universe_data_path, 'rb') as f:
+                for key, value in ijson.kvitems(f, "", use_float=True):
+                    if key in wanted:
+                        data[key] = value
+                        wanted.discard(key)
+                        if not wanted:
+                            break
+        except Exception as e:
+            raise Exception(f"Failed to load universe data: {str(e)}")
+        return data
+
+    def _prefetch_stories(self, story_ids: List[str]):
+        """
+        Stream the requested stories that are not loaded yet from the universe file
+        
+        If a requested story is unknown and the universe file changed since it was
+        loaded (e.g. a story saved while --serve is running), the universe is reloaded
+        first. After that, eagerly loaded universes have nothing left to stream. Found
+        stories are kept in the story index, so each one is decoded at most once.
+        
+        Args:
+            story_ids: Unique identifiers of the stories about to be used
+        """
+        missing = set(story_ids) - self._stories_by_id.keys()
+        if not missing:
+            return
+        if self._universe_changed():
+            self._load_universe()
+            missing -= self._stories_by_id.keys()
+        if self._eager_load or not missing:
+            return
+        
+        import ijson
+        
         try:
-            with open(universe_data_path, 'r') as f:
-                return json.load(f)
+            with open(self.universe_data_path, 'rb') as f:
+                for story in ijson.items(f, "stories.item", use_float=True):
+                    story_id = story.get("id")
+                    if story_id in missing:
+                        self._stories_by_id[story_id] = story
+                        missing.discard(story_id)
+                        if not missing:
+                            break
         except Exception as e:
             raise Exception(f"Failed to load universe data: {str(e)}")
 
+    def _build_indices(self):
+        """Index stories, characters and locations by their IDs"""
+        # Lowercase each character description once for the keyword scans
+        for details in self.universe_data.get("characters", {}).values():
+            if isinstance(details, dict) and "description" in details:
+                details["_description_lower"] = details["description"].lower()
+        
+        self._stories_by_id = {story["id"]: story for story in self.universe_data.get("stories", [])}
+        self._chars_by_ref = self._build_ref_index(self.universe_data.get("characters", {}))
+        self._locs_by_ref = self._build_ref_index(self.universe_data.get("locations", {}))
+
+    @staticmethod
+    def _build_ref_index(entries: Dict) -> Dict[str, Tuple[str, Dict]]:
+        """Map both the name and the ID of every entry to (name, details)"""
+        valid = [(name, details) for name, details in entries.items() if isinstance(details, dict)]
+        index = {details["id"]: (name, details) for name, details in valid if "id" in details}
+        # Names win over IDs, matching the name-first lookup in the story metadata
+        index.update((name, (name, details)) for name, details in valid)
+        return index
+
     def validate_story_exists(self, story_id: str) -> bool:
         """
         Check if story exists in universe data
@@ -55,24 +233,185 @@ class MinmalAmmuImageBuilder:
         Returns:
             bool: True if story exists, False otherwise
         """
-        return any(story["id"] == story_id for story in self.universe_data.get("stories", []))
+        self._prefetch_stories([story_id])
+        return story_id in self._stories_by_id
 
     def _initialize_pipeline(self):
         """Initialize the text-to-image pipeline if not already initialized"""
         if self.pipeline is None:
+            import torch
+            from diffusers import AutoPipelineForText2Image, LCMScheduler
+            
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            torch_dtype = torch.float32 if self.device == "cpu" else torch.float16
+            self._torch_dtype = torch_dtype
+            key = (self.model_path, str(torch_dtype), self.device)
             try:
-                self.pipeline = AutoPipelineForText2Image.from_pretrained(
-                    self.model_path,
-                    torch_dtype=torch.float32 if self.device == "cpu" else torch.float16,
-                    local_files_only=True
-                ).to(self.device)
+                with _PIPELINE_LOCK:
+                    pipeline = _PIPELINE_CACHE.get(key)
+                    if pipeline is None:
+                        pipeline = AutoPipelineForText2Image.from_pretrained(
+                            self.model_path,
+                            torch_dtype=torch_dtype,
+                            local_files_only=True
+                        ).to(self.device)
+                        self._optimize_pipeline(pipeline)
+                        _PIPELINE_CACHE[key] = pipeline
+                    if self.config['pipeline']['auto_turbo']:
+                        self._fast_checkpoint = self._detect_fast_checkpoint(pipeline)
+                        if self._fast_checkpoint == "lcm" and not isinstance(pipeline.scheduler, LCMScheduler):
+                            pipeline.scheduler = LCMScheduler.from_config(pipeline.scheduler.config)
+                self.pipeline = pipeline
             except Exception as e:
                 raise Exception(f"Failed to initialize pipeline: {str(e)}")
 
+    def _ensure_text_encoders(self):
+        """Reload the SDXL text encoders if an earlier generation released them"""
+        from transformers import CLIPTextModel, CLIPTextModelWithProjection
+        
+        subfolders = (
+            ("text_encoder", CLIPTextModel),
+            ("text_encoder_2", CLIPTextModelWithProjection)
+        )
+        with _PIPELINE_LOCK:
+            for name, model_class in subfolders:
+                if hasattr(self.pipeline, name) and getattr(self.pipeline, name) is None:
+                    setattr(self.pipeline, name, model_class.from_pretrained(
+                        self.model_path,
+                        subfolder=name,
+                        torch_dtype=self._torch_dtype,
+                        local_files_only=True
+                    ).to(self.device))
+
+    def _release_text_encoders(self):
+        """Drop the text encoders so the denoising loop has their memory"""
+        with _PIPELINE_LOCK:
+            self.pipeline.text_encoder = None
+            self.pipeline.text_encoder_2 = None
+        self._cleanup_memory()
+
+    def _prompt_inputs(self, prompts: List[str], guidance_scale: float) -> Dict:
+        """
+        Get the prompt arguments for a pipeline call
+        
+        With pipeline.free_text_encoders on an SDXL pipeline the prompts are encoded
+        up front and the text encoders released before denoising; otherwise the
+        prompts are passed through for the pipeline to encode.
+        
+        Args:
+            prompts: Weighted prompts for one batch
+            guidance_scale: Guidance scale used for the batch
+            
+        Returns:
+            Keyword arguments for the pipeline call
+        """
+        self._ensure_text_encoders()
+        if not (self.config['pipeline']['free_text_encoders'] and hasattr(self.pipeline, "text_encoder_2")):
+            return {"prompt": prompts}
+        
+        import torch
+        
+        with torch.no_grad():
+            (prompt_embeds, negative_prompt_embeds,
+             pooled_prompt_embeds, negative_pooled_prompt_embeds) = self.pipeline.encode_prompt(
+                prompt=prompts,
+                device=self.device,
+                # The pipeline call repeats the embeddings per image itself
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=guidance_scale > 1.0
+            )
+        self._release_text_encoders()
+        
+        inputs = {
+            "prompt_embeds": prompt_embeds,
+            "pooled_prompt_embeds": pooled_prompt_embeds
+        }
+        if negative_prompt_embeds is not None:
+            inputs["negative_prompt_embeds"] = negative_prompt_embeds
+            inputs["negative_pooled_prompt_embeds"] = negative_pooled_prompt_embeds
+        return inputs
+
+    def _detect_fast_checkpoint(self, pipeline) -> Optional[str]:
+        """Return 'turbo' or 'lcm' if the loaded checkpoint is a few-step distilled model"""
+        names = (
+            os.path.basename(self.model_path.rstrip("/\\")).lower(),
+            pipeline.scheduler.config.get("_class_name", "").lower()
+        )
+        for kind in _FAST_CHECKPOINT_STEPS:
+            if any(kind in name for name in names):
+                return kind
+        return None
+
+    def _inference_settings(self) -> Tuple[int, float]:
+        """Get (num_inference_steps, guidance_scale), clamped for turbo/LCM checkpoints"""
+        pipeline_config = self.config['pipeline']
+        steps = pipeline_config['num_inference_steps']
+        guidance_scale = pipeline_config['guidance_scale']
+        if self._fast_checkpoint:
+            # Only cap what the checkpoint can't use; configured values inside its range are kept
+            steps = min(steps, _FAST_CHECKPOINT_STEPS[self._fast_checkpoint])
+            if guidance_scale > 1.0:
+                # Above 1.0 diffusers runs classifier-free guidance, doubling UNet work per
+                # step for a checkpoint distilled without it
+                guidance_scale = 0.0
+        return steps, guidance_scale
+
+    def _optimize_pipeline(self, pipeline):
+        """Enable memory-efficient attention and VAE slicing/tiling on a newly loaded pipeline"""
+        import torch
+        from diffusers.models.attention_processor import AttnProcessor2_0
+        
+        try:
+            pipeline.enable_xformers_memory_efficient_attention()
+        except Exception:
+            # xformers missing or no CUDA - fall back to PyTorch 2 scaled-dot-product attention
+            pipeline.unet.set_attn_processor(AttnProcessor2_0())
+        
+        # Decode batched latents one image at a time, and large images in tiles,
+        # to cap VAE peak memory
+        pipeline.enable_vae_slicing()
+        pipeline.enable_vae_tiling()
+        
+        self._quantize_pipeline(pipeline)
+        
+        # Compiled once per loaded pipeline; it stays in _PIPELINE_CACHE with the weights
+        if self.config['pipeline']['compile_unet']:
+            pipeline.unet = torch.compile(pipeline.unet, mode="reduce-overhead", fullgraph=False)
+
+    def _quantize_pipeline(self, pipeline):
+        """
+        Quantize UNet (and text encoder) weights to int8 according to pipeline.quantization
+        
+        'none' keeps the fp16/fp32 weights, 'qint8' uses optimum-quanto weight-only int8,
+        'dynamic' uses torch dynamic int8 quantization of Linear layers (CPU only).
+        """
+        mode = self.config['pipeline']['quantization']
+        if mode == "none":
+            return
+        
+        if mode == "qint8":
+            from optimum.quanto import quantize, qint8, freeze
+            
+            for module in (pipeline.unet, pipeline.text_encoder):
+                quantize(module, weights=qint8)
+                freeze(module)
+        elif mode == "dynamic":
+            import torch
+            
+            if self.device != "cpu":
+                raise Exception("Dynamic quantization is only supported on CPU")
+            pipeline.unet = torch.ao.quantization.quantize_dynamic(
+                pipeline.unet, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        else:
+            raise Exception(f"Unknown quantization mode: {mode}")
+
     def _cleanup_memory(self):
         """Clean up GPU/CPU memory"""
         gc.collect()
         if self.device == "cuda":
+            import torch
+            
             torch.cuda.empty_cache()
 
     def _get_story(self, story_id: str) -> Dict:
@@ -85,26 +424,23 @@ class MinmalAmmuImageBuilder:
         Returns:
             Dict containing story details
         """
-        for story in self.universe_data.get("stories", []):
-            if story["id"] == story_id:
-                return story
-        raise Exception(f"Story {story_id} not found in universe data")
+        self._prefetch_stories([story_id])
+        story = self._stories_by_id.get(story_id)
+        if story is None:
+            raise Exception(f"Story {story_id} not found in universe data")
+        return story
 
     def _get_character_details(self, character_ids: List[str]) -> List[Dict]:
         """Get character details from universe data"""
         characters = []
         for char_id in character_ids:
-            char = self.universe_data["characters"].get(char_id)
-            if not char:
-                for name, details in self.universe_data["characters"].items():
-                    if details["id"] == char_id:
-                        char = details
-                        break
-            
+            # Entries may reference a character by name or by ID
+            name, char = self._chars_by_ref.get(char_id, (None, None))
             if char:
                 characters.append({
-                    "name": char_id if char_id in self.universe_data["characters"] else name,
+                    "name": name,
                     "description": char["description"],
+                    "description_lower": char["_description_lower"],
                     "powers": char.get("powers", [])
                 })
         return characters
@@ -113,27 +449,23 @@ class MinmalAmmuImageBuilder:
         """Get location details from universe data"""
         locations = []
         for loc_id in location_ids:
-            loc = self.universe_data["locations"].get(loc_id)
-            if not loc:
-                for name, details in self.universe_data["locations"].items():
-                    if details["id"] == loc_id:
-                        loc = details
-                        break
-            
+            # Entries may reference a location by name or by ID
+            name, loc = self._locs_by_ref.get(loc_id, (None, None))
             if loc:
                 locations.append({
-                    "name": loc_id if loc_id in self.universe_data["locations"] else name,
+                    "name": name,
                     "description": loc["description"]
                 })
         return locations
 
-    def _get_main_character_features(self, char: Dict) -> str:
+    def _get_main_character_features(self, char: Dict, desc_lower: str) -> str:
         """Extract only essential character features"""
         main_features = []
         
-        if "indian" in char['description'].lower():
+        found = set(_FEATURE_RE.findall(desc_lower))
+        if "indian" in found:
             main_features.append("Indian")
-        if "brown skin" in char['description'].lower():
+        if "brown skin" in found:
             main_features.append("brown skin")
         
         if char.get('powers'):
@@ -145,24 +477,24 @@ class MinmalAmmuImageBuilder:
         
         return ", ".join(main_features)
 
-    def _get_scene_details(self, story: Dict) -> str:
-        """Get additional scene details"""
-        content = story["content"].lower()
+    def _get_scene_details(self, content_lower: str) -> str:
+        """Get additional scene details from the lowercased story content"""
+        found = set(_SCENE_RE.findall(content_lower))
         
         time_of_day = "daytime"
-        if "night" in content or "evening" in content:
+        if "night" in found or "evening" in found:
             time_of_day = "nighttime"
-        elif "sunset" in content:
+        elif "sunset" in found:
             time_of_day = "sunset"
-        elif "morning" in content:
+        elif "morning" in found:
             time_of_day = "morning"
             
         weather = "clear sky"
-        if "rain" in content:
+        if "rain" in found:
             weather = "rainy"
-        elif "storm" in content:
+        elif "storm" in found:
             weather = "stormy"
-        elif "cloud" in content:
+        elif "cloud" in found:
             weather = "cloudy"
             
         return f"{time_of_day}, {weather}, detailed background"
@@ -182,7 +514,7 @@ class MinmalAmmuImageBuilder:
         
         if characters:
             main_char = characters[0]
-            char_desc = f"{main_char['name']}, {self._get_main_character_features(main_char)}"
+            char_desc = f"{main_char['name']}, {self._get_main_character_features(main_char, main_char['description_lower'])}"
             elements.append(char_desc)
         
         if locations:
@@ -192,79 +524,160 @@ class MinmalAmmuImageBuilder:
 
     def _validate_image_size(self, size: int) -> int:
         """Validate and adjust image size to meet model requirements"""
-        if size < self.config['model']['min_size']:
-            return self.config['model']['min_size']
-        if size > self.config['model']['max_size']:
-            return self.config['model']['max_size']
-            
-        step = self.config['model']['size_step']
-        return (size // step) * step
+        # Round down to the step, then clamp to [min_size, max_size]
+        return max(self._min_size, min(self._max_size, size - size % self._size_step))
 
-    def generate_image(self, story_id: str, image_size: Optional[int] = None) -> Tuple[str, float]:
-        """Generate an image for the given story"""
+    @staticmethod
+    def _build_prompt_template(style_config: Dict) -> str:
+        """Pre-format the static style/quality text and weights into a %-template"""
+        weights = style_config['weights']
+        base_style = style_config['base_style'].replace("%", "%%")
+        quality_boost = style_config['quality_boost'].replace("%", "%%")
+        return (
+            f"(%(main)s:{weights['main_prompt']}) AND "
+            f"(Style: {base_style}:{weights['style']}) AND "
+            f"(Scene details: %(scene)s:{weights['scene']}) AND "
+            f"(Quality: {quality_boost}:{weights['quality']})"
+        )
+
+    def _build_weighted_prompt(self, story: Dict) -> str:
+        """Combine the story prompt with the style, scene and quality prompts using their weights"""
+        cached = self._prompt_cache.get(story["id"])
+        if cached is not None:
+            return cached
+        
+        combined_prompt = self._prompt_template % {
+            "main": self._create_prompt(story),
+            "scene": self._get_scene_details(story['content'].lower())
+        }
+        self._prompt_cache[story["id"]] = combined_prompt
+        return combined_prompt
+
+    def generate_images(self, story_ids: List[str], image_size: Optional[int] = None) -> Tuple[List[str], float]:
+        """
+        Generate one image per story, running the stories through the pipeline as a batch
+        
+        Args:
+            story_ids: Unique identifiers of the stories
+            image_size: Image size used for every story
+            
+        Returns:
+            Tuple of the saved image paths (in story_ids order) and the total generation time
+        """
         try:
-            # First check if story exists before initializing the pipeline
-            if not self.validate_story_exists(story_id):
-                raise Exception(f"Story {story_id} not found in universe data")
+            # Look the stories up first so a bad ID fails before the pipeline is loaded
+            story_ids = list(dict.fromkeys(story_ids))
+            self._prefetch_stories(story_ids)
+            stories = [self._get_story(story_id) for story_id in story_ids]
 
             # Initialize pipeline only when we know we'll use it
             self._initialize_pipeline()
             
-            # Get story and create prompt
-            story = self._get_story(story_id)
-            prompt = self._create_prompt(story)
+            prompts = [self._build_weighted_prompt(story) for story in stories]
             size = self._validate_image_size(image_size or self.default_size)
             
-            # Generate image with weighted prompts
-            start_time = time.time()
-            
-            style_config = self.config['style']
-            weights = style_config['weights']
-            
-            weighted_prompts = [
-                (prompt, weights['main_prompt']),
-                (f"Style: {style_config['base_style']}", weights['style']),
-                (f"Scene details: {self._get_scene_details(story)}", weights['scene']),
-                (f"Quality: {style_config['quality_boost']}", weights['quality'])
-            ]
-            
-            combined_prompt = " AND ".join([f"({p[0]}:{p[1]})" for p in weighted_prompts])
+            for story_id, combined_prompt in zip(story_ids, prompts):
+                print(f"-------> Generating image for story {story_id} with prompt: {combined_prompt} <-------")
             
-            print(f"-------> Generating image for story {story_id} with prompt: {combined_prompt} <-------")
-            # Generate image
             pipeline_config = self.config['pipeline']
-            image = self.pipeline(
-                prompt=combined_prompt,
-                num_inference_steps=pipeline_config['num_inference_steps'],
-                height=size,
-                width=size,
-                guidance_scale=pipeline_config['guidance_scale'],
-                num_images_per_prompt=pipeline_config['num_images_per_prompt']
-            ).images[0]
+            num_inference_steps, guidance_scale = self._inference_settings()
+            images_per_prompt = pipeline_config['num_images_per_prompt']
+            batch_size = pipeline_config['batch_size']
             
-            generation_time = time.time() - start_time
-            
-            # Save image
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            output_dir = Path(self.config['output']['story_images_dir']) / story_id
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            output_path = output_dir / f"story_image_{story_id}_{timestamp}.png"
-            image.save(output_path)
+            output_paths = []
+            start_time = time.time()
+            for i in range(0, len(prompts), batch_size):
+                # One pipeline call per batch so the UNet runs on a batched tensor
+                images = self.pipeline(
+                    **self._prompt_inputs(prompts[i:i + batch_size], guidance_scale),
+                    num_inference_steps=num_inference_steps,
+                    height=size,
+                    width=size,
+                    guidance_scale=guidance_scale,
+                    num_images_per_prompt=images_per_prompt
+                ).images
+                
+                # Queue the first image of each prompt now, so this batch is written
+                # while the next one is denoising
+                for j, story_id in enumerate(story_ids[i:i + batch_size]):
+                    output_dir = Path(self.config['output']['story_images_dir']) / story_id
+                    ensure_dir(output_dir)
+                    
+                    output_path = output_dir / f"story_image_{story_id}_{timestamp}.{self._image_format}"
+                    self._save_image_async(images[j * images_per_prompt], output_path)
+                    output_paths.append(str(output_path))
+            generation_time = time.time() - start_time
             
             # Cleanup
             self._cleanup_memory()
             
-            return str(output_path), generation_time
+            return output_paths, generation_time
             
         except Exception as e:
             raise Exception(f"Image generation failed: {str(e)}")
 
+    def _save_image_async(self, image, output_path: Path):
+        """Queue an image save on the I/O thread pool using the configured format"""
+        self._pending_saves = [f for f in self._pending_saves if not f.done() or f.exception()]
+        self._pending_saves.append(
+            self._io_executor.submit(image.save, output_path, **self._save_options)
+        )
+
+    def wait_for_saves(self):
+        """Block until every queued image is written, raising the first save error"""
+        pending, self._pending_saves = self._pending_saves, []
+        errors = [f.exception() for f in pending if f.exception() is not None]
+        if errors:
+            raise Exception(f"Failed to save image: {str(errors[0])}")
+
+    def close(self):
+        """Finish pending image saves and stop the I/O thread pool"""
+        try:
+            self.wait_for_saves()
+        finally:
+            self._io_executor.shutdown(wait=True)
+
+    def generate_image(self, story_id: str, image_size: Optional[int] = None) -> Tuple[str, float]:
+        """Generate an image for the given story"""
+        output_paths, generation_time = self.generate_images([story_id], image_size=image_size)
+        return output_paths[0], generation_time
+
+    def serve(self, image_size: Optional[int] = None, stream=sys.stdin):
+        """
+        Generate images for story IDs read from a stream, reusing the loaded pipeline
+        
+        Each line holds one story ID, or several comma-separated IDs generated as
+        one generate_images call (so their saves overlap the following batches).
+        
+        Args:
+            image_size: Image size used for every story
+            stream: File-like object to read story IDs from
+        """
+        for line in stream:
+            story_ids = [story_id.strip() for story_id in line.split(",") if story_id.strip()]
+            if not story_ids:
+                continue
+            try:
+                image_paths, gen_time = self.generate_images(story_ids, image_size=image_size)
+                # The paths are handed to whoever is reading stdout, so they must exist first
+                self.wait_for_saves()
+                print(f"Image generated successfully in {gen_time:.2f} seconds")
+                for image_path in image_paths:
+                    print(f"Image saved at: {image_path}")
+            except Exception as e:
+                print(f"Error: {str(e)}")
+            sys.stdout.flush()
+
 def main():
     parser = argparse.ArgumentParser(description='Generate story images using MinmalAmmu Image Builder')
     parser.add_argument('--story_id', type=str, help='Story ID for image generation')
+    parser.add_argument('--story_ids', type=str,
+                        help='Comma-separated story IDs to generate as one batch')
     parser.add_argument('--size', type=int, help='Image size (optional)', default=512)
     parser.add_argument('--config', type=str, help='Path to config file', default='config.ini')
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep the model loaded and read story IDs from stdin, one per line')
     
     args = parser.parse_args()
     
@@ -275,16 +688,29 @@ def main():
         # Initialize builder with configuration
         builder = MinmalAmmuImageBuilder(config)
         
-        # First validate if story exists
-        if not builder.validate_story_exists(args.story_id):
-            print(f"Error: Story {args.story_id} not found in universe data")
-            return 1
-        
-        # Generate image only if story exists
-        image_path, gen_time = builder.generate_image(args.story_id, image_size=args.size)
-        
-        print(f"Image generated successfully in {gen_time:.2f} seconds")
-        print(f"Image saved at: {image_path}")
+        try:
+            if args.serve:
+                builder.serve(image_size=args.size)
+                return 0
+            
+            if args.story_ids:
+                story_ids = [story_id.strip() for story_id in args.story_ids.split(",") if story_id.strip()]
+                image_paths, gen_time = builder.generate_images(story_ids, image_size=args.size)
+                builder.wait_for_saves()
+                
+                print(f"{len(image_paths)} images generated successfully in {gen_time:.2f} seconds")
+                for image_path in image_paths:
+                    print(f"Image saved at: {image_path}")
+                return 0
+            
+            # generate_image checks the story exists before loading the model
+            image_path, gen_time = builder.generate_image(args.story_id, image_size=args.size)
+            builder.wait_for_saves()
+            
+            print(f"Image generated successfully in {gen_time:.2f} seconds")
+            print(f"Image saved at: {image_path}")
+        finally:
+            builder.close()
         
     except Exception as e:
         print(f"Error: {str(e)}")
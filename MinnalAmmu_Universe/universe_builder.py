@@ -1,27 +1,63 @@
 import streamlit as st
-import json
+import logging
 import os
+import string
+import tempfile
+import threading
+import orjson
 from datetime import datetime
 
+# Characters/locations rendered per page on the View Universe page
+PAGE_SIZE = 25
+
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
+log = logging.getLogger(__name__)
+
+# Only the current version is worth keeping: every story the generator saves
+# changes the mtime, and older parsed copies would otherwise pile up
+@st.cache_data(show_spinner=False, max_entries=1)
+def _load_universe(path, mtime):
+    """Parse the universe file; cached until its modification time changes"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
 class UniverseBuilder:
+    __slots__ = (
+        'universe_file', 'universe_data', '_loaded_mtime', '_lock',
+        '_char_by_id', '_loc_by_id', '_story_by_id',
+        '_char_name_lower', '_loc_name_lower'
+    )
+
     def __init__(self):
         self.universe_file = "universe/universe_data.json"
         os.makedirs("universe", exist_ok=True)
+        # get_builder shares this builder between sessions, whose reruns run on
+        # separate threads; re-entrant because edits refresh and save under it
+        self._lock = threading.RLock()
         self.load_universe()
 
     def load_universe(self):
         """Load universe data"""
+        with self._lock:
+            self._load_universe_locked()
+
+    def _load_universe_locked(self):
+        """Load universe data; the caller holds the lock"""
+        self._loaded_mtime = None
         if os.path.exists(self.universe_file):
             try:
-                with open(self.universe_file, 'r') as f:
-                    self.universe_data = json.load(f)
-                st.write(f"✅ Universe data loaded successfully")
-                st.write(f"Found {len(self.universe_data.get('characters', {}))} characters")
-                st.write(f"Found {len(self.universe_data.get('locations', {}))} locations")
-                st.write(f"Found {len(self.universe_data.get('stories', []))} stories")
+                mtime = os.path.getmtime(self.universe_file)
+                self.universe_data = _load_universe(self.universe_file, mtime)
+                self._loaded_mtime = mtime
+                log.info(
+                    "Universe data loaded: %d characters, %d locations, %d stories",
+                    len(self.universe_data.get('characters', {})),
+                    len(self.universe_data.get('locations', {})),
+                    len(self.universe_data.get('stories', []))
+                )
             except Exception as e:
                 st.error(f"Error loading universe data: {str(e)}")
-                self.universe_data = {'characters': {}, 'locations': {}, 'stories': []}
+                self.universe_data = {'characters': {}, 'locations': {}, 'stories': [], 'id_counters': {}}
         else:
             st.error("Universe data not found. Creating new universe.")
             self.universe_data = {
@@ -30,14 +66,94 @@ class UniverseBuilder:
                 'relationships': {},
                 'events': [],
                 'stories': [],
+                'id_counters': {},
                 'last_updated': None
             }
+        self._build_indices()
+        if 'id_counters' not in self.universe_data:
+            # Universe files written before counters were persisted
+            self.universe_data['id_counters'] = self._rebuild_id_counters()
+
+    def refresh_if_changed(self):
+        """Reload the universe if another tool changed the file since it was loaded or saved"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.universe_file)
+            except OSError:
+                return
+            if mtime != self._loaded_mtime:
+                self._load_universe_locked()
 
-    def save_universe(self):
-        """Save universe data"""
-        self.universe_data['last_updated'] = datetime.now().isoformat()
-        with open(self.universe_file, 'w') as f:
-            json.dump(self.universe_data, f, indent=2)
+    def _build_indices(self):
+        """Index characters, locations and stories by their IDs, and names by lowercase name"""
+        self._char_by_id = {
+            data['id']: (name, data)
+            for name, data in self.universe_data.get('characters', {}).items()
+            if isinstance(data, dict) and 'id' in data
+        }
+        self._loc_by_id = {
+            data['id']: (name, data)
+            for name, data in self.universe_data.get('locations', {}).items()
+            if isinstance(data, dict) and 'id' in data
+        }
+        self._story_by_id = {
+            story['id']: story for story in self.universe_data.get('stories', []) if 'id' in story
+        }
+        # The first name of any case-insensitive duplicates wins, like the old scan
+        self._char_name_lower = {}
+        for name in self.universe_data.get('characters', {}):
+            self._char_name_lower.setdefault(name.lower(), name)
+        self._loc_name_lower = {}
+        for name in self.universe_data.get('locations', {}):
+            self._loc_name_lower.setdefault(name.lower(), name)
+
+    def save_universe(self, now_iso=None):
+        """Save universe data, stamping it with now_iso (or the current time)"""
+        with self._lock:
+            self.universe_data['last_updated'] = now_iso or datetime.now().isoformat()
+            # Compact by default; UNIVERSE_PRETTY=1 writes human-diffable output
+            option = orjson.OPT_INDENT_2 if os.environ.get("UNIVERSE_PRETTY") else 0
+            # Write a uniquely named temporary file and swap it in so a crash never
+            # leaves a truncated universe and concurrent saves never share a temp file
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(self.universe_file) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(orjson.dumps(self.universe_data, option=option))
+                os.chmod(tmp_file, 0o644)
+                os.replace(tmp_file, self.universe_file)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+            # The in-memory data already matches what was written; no reload needed
+            self._loaded_mtime = os.path.getmtime(self.universe_file)
+            # Drop the parsed copy of the previous version of the file
+            _load_universe.clear()
+
+    def _ids_for_prefix(self, prefix):
+        """Get the ID index for an ID prefix"""
+        if prefix == "CHAR":
+            return self._char_by_id
+        elif prefix == "LOC":
+            return self._loc_by_id
+        elif prefix == "STORY":
+            return self._story_by_id
+        return {}
+
+    def _id_exists(self, prefix, id):
+        """Check whether an ID is already used"""
+        return id in self._ids_for_prefix(prefix)
+
+    def _rebuild_id_counters(self):
+        """Rebuild the latest sequence number per prefix and day from the existing IDs"""
+        counters = {}
+        for prefix in ("CHAR", "LOC", "STORY"):
+            prefix_counters = counters.setdefault(prefix, {})
+            for id in self._ids_for_prefix(prefix):
+                day_key, sequence = id[len(prefix):-5], id[-5:]
+                if not (id.startswith(prefix) and len(day_key) == 8 and sequence.isdigit()):
+                    continue
+                prefix_counters[day_key] = max(prefix_counters.get(day_key, 0), int(sequence))
+        return counters
 
     def generate_id(self, prefix, year=None, month=None, day=None, sequence=None):
         """Generate ID with specified format"""
@@ -47,117 +163,134 @@ class UniverseBuilder:
             month = now.month
             day = now.day
             
-        # Get latest sequence number for the day
+        # Next sequence number for the day from the persisted counters
         if not sequence:
-            existing_ids = []
-            if prefix == "CHAR":
-                existing_ids = [char_data['id'] for char_data in self.universe_data['characters'].values()]
-            elif prefix == "LOC":
-                existing_ids = [loc_data['id'] for loc_data in self.universe_data['locations'].values()]
-            elif prefix == "STORY":
-                existing_ids = [story.get('id', '') for story in self.universe_data['stories']]
-            
-            # Filter IDs for the current day
-            today_prefix = f"{prefix}{year}{month:02d}{day:02d}"
-            today_ids = [id for id in existing_ids if id.startswith(today_prefix)]
-            
-            if today_ids:
-                # Get the highest sequence number
-                sequence = max([int(id[-5:]) for id in today_ids]) + 1
-            else:
-                sequence = 1
+            today_key = f"{year}{month:02d}{day:02d}"
+            day_counters = self.universe_data['id_counters'].setdefault(prefix, {})
+            sequence = day_counters.get(today_key, 0) + 1
+            # IDs added by other tools don't advance the counters, so skip any taken ones
+            while self._id_exists(prefix, f"{prefix}{today_key}{sequence:05d}"):
+                sequence += 1
+            day_counters[today_key] = sequence
 
         return f"{prefix}{year}{month:02d}{day:02d}{sequence:05d}"
 
-    def add_character(self, name, attributes):
-        """Add or update character"""
+    def _upsert_entry(self, section, label, prefix, name, data):
+        """
+        Add or update a character or location, keeping the ID of an existing entry
+        
+        Args:
+            section: Universe data key ('characters' or 'locations')
+            label: Name used in messages ('Character' or 'Location')
+            prefix: ID prefix for new entries
+            name: Entry name
+            data: Entry attributes; ID and dates are filled in
+        """
+        with self._lock:
+            # Start from the file on disk so stories saved by the story generator
+            # (or another session) since the last load aren't overwritten
+            self.refresh_if_changed()
+            return self._upsert_entry_locked(section, label, prefix, name, data)
+
+    def _upsert_entry_locked(self, section, label, prefix, name, data):
+        """Add or update a character or location; the caller holds the lock"""
+        # Look the indices up only now, as the refresh may have rebuilt them
+        if section == 'characters':
+            by_id, name_lower_map = self._char_by_id, self._char_name_lower
+        else:
+            by_id, name_lower_map = self._loc_by_id, self._loc_name_lower
+        now_iso = datetime.now().isoformat()
         name_lower = name.lower()
-        existing_char = None
+        existing = None
         
-        # Check for existing character
-        for char_name, char_data in self.universe_data['characters'].items():
-            if char_name.lower() == name_lower:
-                existing_char = char_data
-                st.warning(f"Character {name} already exists! Updating instead.")
-                break
+        # Check for existing entry
+        existing_name = name_lower_map.get(name_lower)
+        if existing_name is not None:
+            existing = self.universe_data[section][existing_name]
+            st.warning(f"{label} {name} already exists! Updating instead.")
         
-        if existing_char:
-            # Update existing character but keep the ID
-            char_id = existing_char['id']
-            attributes['id'] = char_id
-            attributes['created_date'] = existing_char['created_date']
-            if 'story_appearances' in existing_char:
-                attributes['story_appearances'] = existing_char['story_appearances']
+        if existing:
+            # Update existing entry but keep the ID
+            entry_id = existing['id']
+            data['id'] = entry_id
+            data['created_date'] = existing['created_date']
+            if 'story_appearances' in existing:
+                data['story_appearances'] = existing['story_appearances']
         else:
-            # Generate new ID for new character
-            char_id = self.generate_id("CHAR")
-            attributes['id'] = char_id
-            attributes['created_date'] = datetime.now().isoformat()
-            attributes['story_appearances'] = []
-
-        attributes['last_updated'] = datetime.now().isoformat()
-        self.universe_data['characters'][name] = attributes
-        self.save_universe()
+            # Generate new ID for new entry
+            entry_id = self.generate_id(prefix)
+            data['id'] = entry_id
+            data['created_date'] = now_iso
+            data['story_appearances'] = []
+
+        data['last_updated'] = now_iso
+        self.universe_data[section][name] = data
+        by_id[entry_id] = (name, data)
+        name_lower_map[name_lower] = name
+        self.save_universe(now_iso)
         return True
 
+    def add_character(self, name, attributes):
+        """Add or update character"""
+        return self._upsert_entry('characters', "Character", "CHAR", name, attributes)
+
     def add_location(self, name, details):
         """Add or update location"""
-        name_lower = name.lower()
-        existing_loc = None
-        
-        # Check for existing location
-        for loc_name, loc_data in self.universe_data['locations'].items():
-            if loc_name.lower() == name_lower:
-                existing_loc = loc_data
-                st.warning(f"Location {name} already exists! Updating instead.")
-                break
-
-        if existing_loc:
-            # Update existing location but keep the ID
-            loc_id = existing_loc['id']
-            details['id'] = loc_id
-            details['created_date'] = existing_loc['created_date']
-            if 'story_appearances' in existing_loc:
-                details['story_appearances'] = existing_loc['story_appearances']
-        else:
-            # Generate new ID for new location
-            loc_id = self.generate_id("LOC")
-            details['id'] = loc_id
-            details['created_date'] = datetime.now().isoformat()
-            details['story_appearances'] = []
-
-        details['last_updated'] = datetime.now().isoformat()
-        self.universe_data['locations'][name] = details
-        self.save_universe()
-        return True
+        return self._upsert_entry('locations', "Location", "LOC", name, details)
 
     def get_character_by_id(self, char_id):
         """Get character details by ID"""
-        for name, data in self.universe_data['characters'].items():
-            if data.get('id') == char_id:
-                return name, data
-        return None, None
+        return self._char_by_id.get(char_id, (None, None))
 
     def get_location_by_id(self, loc_id):
         """Get location details by ID"""
-        for name, data in self.universe_data['locations'].items():
-            if data.get('id') == loc_id:
-                return name, data
-        return None, None
+        return self._loc_by_id.get(loc_id, (None, None))
 
     def get_story_by_id(self, story_id):
         """Get story details by ID"""
-        for story in self.universe_data['stories']:
-            if story.get('id') == story_id:
-                return story
-        return None
+        return self._story_by_id.get(story_id)
+
+@st.cache_resource(show_spinner=False)
+def get_builder():
+    """One UniverseBuilder kept across reruns (and sessions) instead of one per rerun"""
+    return UniverseBuilder()
+
+def _paginate(items, key):
+    """Show a page selector when the items span several pages and return the selected page"""
+    items = list(items)
+    page_count = -(-len(items) // PAGE_SIZE)
+    if page_count <= 1:
+        return items
+    page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, value=1, step=1, key=key)
+    start = (page - 1) * PAGE_SIZE
+    return items[start:start + PAGE_SIZE]
+
+def _entity_markdown(builder, fields, data):
+    """Build the expander body for a character or location as one markdown block"""
+    blocks = [f"{label} {value}" for label, value in fields]
+    
+    # Linked stories
+    if data.get('story_appearances'):
+        story_lines = []
+        for story_id in data['story_appearances']:
+            story = builder.get_story_by_id(story_id)
+            if story:
+                story_lines.append(f"- {story['title']} ({story_id})")
+        blocks.append("Appears in stories:")
+        if story_lines:
+            blocks.append("\n".join(story_lines))
+    
+    blocks.append(f"Created: {data.get('created_date', 'Unknown')}")
+    blocks.append(f"Last Updated: {data.get('last_updated', 'Unknown')}")
+    return "\n\n".join(blocks)
 
 def main():
     st.set_page_config(page_title="MinnalAmmu Universe Builder", layout="wide")
     st.title("🌟 MinnalAmmu Universe Builder")
 
-    # Initialize UniverseBuilder
-    builder = UniverseBuilder()
+    # Reuse the cached UniverseBuilder, picking up changes made by other tools
+    builder = get_builder()
+    builder.refresh_if_changed()
 
     # Sidebar for navigation
     page = st.sidebar.selectbox(
@@ -171,43 +304,26 @@ def main():
         # Display Characters
         st.subheader("Characters")
         if builder.universe_data['characters']:
-            for name, attrs in builder.universe_data['characters'].items():
+            for name, attrs in _paginate(builder.universe_data['characters'].items(), "character_page"):
                 with st.expander(f"🦸‍♂️ {name} (ID: {attrs['id']})"):
-                    st.write("Powers:", ", ".join(attrs.get('powers', [])))
-                    st.write("Description:", attrs.get('description', ''))
-                    st.write("ID:", attrs.get('id', 'No ID'))
-                    
-                    # Display linked stories
-                    if 'story_appearances' in attrs and attrs['story_appearances']:
-                        st.write("Appears in stories:")
-                        for story_id in attrs['story_appearances']:
-                            story = builder.get_story_by_id(story_id)
-                            if story:
-                                st.write(f"- {story['title']} ({story_id})")
-                    
-                    st.write("Created:", attrs.get('created_date', 'Unknown'))
-                    st.write("Last Updated:", attrs.get('last_updated', 'Unknown'))
+                    # One markdown element per expander instead of a write per line
+                    st.markdown(_entity_markdown(builder, [
+                        ("Powers:", ", ".join(attrs.get('powers', []))),
+                        ("Description:", attrs.get('description', '')),
+                        ("ID:", attrs.get('id', 'No ID'))
+                    ], attrs))
         else:
             st.info("No characters added yet.")
         
         # Display Locations
         st.subheader("Locations")
         if builder.universe_data['locations']:
-            for name, details in builder.universe_data['locations'].items():
+            for name, details in _paginate(builder.universe_data['locations'].items(), "location_page"):
                 with st.expander(f"🏢 {name} (ID: {details['id']})"):
-                    st.write("Description:", details.get('description', ''))
-                    st.write("ID:", details.get('id', 'No ID'))
-                    
-                    # Display linked stories
-                    if 'story_appearances' in details and details['story_appearances']:
-                        st.write("Appears in stories:")
-                        for story_id in details['story_appearances']:
-                            story = builder.get_story_by_id(story_id)
-                            if story:
-                                st.write(f"- {story['title']} ({story_id})")
-                    
-                    st.write("Created:", details.get('created_date', 'Unknown'))
-                    st.write("Last Updated:", details.get('last_updated', 'Unknown'))
+                    st.markdown(_entity_markdown(builder, [
+                        ("Description:", details.get('description', '')),
+                        ("ID:", details.get('id', 'No ID'))
+                    ], details))
         else:
             st.info("No locations added yet.")
 
@@ -262,6 +378,9 @@ def main():
     elif page == "View Story References":
         st.header("Story References")
         
+        # References are IDs (a prefix followed by digits, resolved by the prefix) or plain names
+        resolvers = {'CHAR': builder.get_character_by_id, 'LOC': builder.get_location_by_id}
+        
         # Display stories and their references
         for story in builder.universe_data.get('stories', []):
             with st.expander(f"📚 {story['title']} (ID: {story['id']})"):
@@ -273,12 +392,14 @@ def main():
                 st.write("- Word Count:", story['metadata']['word_count'])
                 st.write("\nCharacters:")
                 for char in story['metadata']['characters_used']:
-                    char_name, char_data = builder.get_character_by_id(char) if char.startswith('CHAR') else (char, None)
+                    resolver = resolvers.get(char.rstrip(string.digits))
+                    char_name, char_data = resolver(char) if resolver else (char, None)
                     if char_name:
                         st.write(f"- {char_name}")
                 st.write("\nLocations:")
                 for loc in story['metadata']['locations_used']:
-                    loc_name, loc_data = builder.get_location_by_id(loc) if loc.startswith('LOC') else (loc, None)
+                    resolver = resolvers.get(loc.rstrip(string.digits))
+                    loc_name, loc_data = resolver(loc) if resolver else (loc, None)
                     if loc_name:
                         st.write(f"- {loc_name}")
 
@@ -1,12 +1,47 @@
-import json
 import os
+import functools
+import ijson
+import orjson
 from datetime import datetime
-from fpdf import FPDF
+from fpdf import FPDF, XPos, YPos
 from PIL import Image
-import glob
 import sys
 
+# Embedded image resolution; larger story images are downscaled to this before embedding
+PDF_IMAGE_DPI = 150
+
+@functools.lru_cache(maxsize=4)
+def _parse_universe_file(path, mtime):
+    """Parse the universe JSON file; cached until its modification time changes"""
+    with open(path, 'rb') as file:
+        return orjson.loads(file.read())
+
+@functools.lru_cache(maxsize=256)
+def _find_story_in_file(path, mtime, story_id):
+    """Stream the stories array, stopping at the requested story; cached per file version"""
+    with open(path, 'rb') as file:
+        for story in ijson.items(file, 'stories.item', use_float=True):
+            if story.get('id') == story_id:
+                return story
+    return None
+
+@functools.lru_cache(maxsize=64)
+def _latest_image_in_dir(story_image_dir, story_id, dir_mtime_ns):
+    """Find the newest image of a story in its directory; cached until the directory changes"""
+    prefix = f"story_image_{story_id}"
+    latest_image, latest_ctime = None, None
+    with os.scandir(story_image_dir) as entries:
+        for entry in entries:
+            if not (entry.name.startswith(prefix) and entry.name.endswith(".png")):
+                continue
+            ctime = entry.stat().st_ctime
+            if latest_ctime is None or ctime > latest_ctime:
+                latest_image, latest_ctime = entry.path, ctime
+    return latest_image
+
 class StoryComposer:
+    __slots__ = ('base_dir', 'universe_file_path', 'base_image_path', 'output_dir')
+
     def __init__(self, script_dir):
         """
         Initialize StoryComposer with base directory path
@@ -42,32 +77,30 @@ class StoryComposer:
             
     def load_universe_data(self):
         """Load and parse the universe JSON data"""
-        with open(self.universe_file_path, 'r') as file:
-            return json.load(file)
+        return _parse_universe_file(self.universe_file_path, os.path.getmtime(self.universe_file_path))
             
     def find_story(self, story_id):
         """Find a story by its ID in the universe data"""
-        universe_data = self.load_universe_data()
-        for story in universe_data['stories']:
-            if story['id'] == story_id:
-                return story
-        return None
+        # Only the stories are decoded, and only up to the matching one
+        return _find_story_in_file(
+            self.universe_file_path, os.path.getmtime(self.universe_file_path), story_id
+        )
         
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _story_image_dir(base_image_path, story_id):
+        """Get the image directory of a story (joined once per story)"""
+        return os.path.join(base_image_path, story_id)
+
     def get_latest_story_image(self, story_id):
         """Find the most recent image for a given story ID"""
-        story_image_dir = os.path.join(self.base_image_path, story_id)
-        if not os.path.exists(story_image_dir):
-            return None
-            
-        # Get all image files in the directory
-        image_files = glob.glob(os.path.join(story_image_dir, f"story_image_{story_id}*.png"))
-        
-        if not image_files:
+        story_image_dir = self._story_image_dir(self.base_image_path, story_id)
+        # One stat both checks the directory exists and keys the cache; adding or
+        # removing an image changes the directory mtime, invalidating the cached result
+        try:
+            return _latest_image_in_dir(story_image_dir, story_id, os.stat(story_image_dir).st_mtime_ns)
+        except (FileNotFoundError, NotADirectoryError):
             return None
-            
-        # Sort by creation time and get the most recent
-        latest_image = max(image_files, key=os.path.getctime)
-        return latest_image
         
     def create_story_pdf(self, story_id):
         """
@@ -100,53 +133,48 @@ class StoryComposer:
         pdf = FPDF()
         pdf.add_page()
         
-        # Use built-in fonts instead of DejaVu
-        pdf.set_font('Helvetica', '', 12)
-        
-        # Add title
+        # Add title (built-in fonts instead of DejaVu)
         pdf.set_font('Helvetica', 'B', 24)
-        pdf.cell(0, 20, story['title'], ln=True, align='C')
+        pdf.cell(0, 20, story['title'], new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
         
         # Add metadata
         pdf.set_font('Helvetica', '', 12)
-        pdf.cell(0, 10, f"Theme: {story['metadata']['theme']}", ln=True)
-        pdf.cell(0, 10, f"Age Group: {story['metadata']['target_age']}", ln=True)
+        pdf.cell(0, 10, f"Theme: {story['metadata']['theme']}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.cell(0, 10, f"Age Group: {story['metadata']['target_age']}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         # Add image (we know it exists at this point)
         try:
-            # Get image dimensions
-            with Image.open(image_path) as img:
-                width, height = img.size
-            # Scale image to fit page while maintaining aspect ratio
+            # Scale image to fit page while maintaining aspect ratio; fpdf2 reports
+            # the placed size, so the image only has to be read once
             max_width = 190  # Max width in mm for A4
-            scale = max_width / width
-            image_height = height * scale
-            
-            pdf.image(image_path, x=10, y=pdf.get_y() + 10, w=max_width)
-            pdf.ln(image_height + 20)  # Add space after image
+            target_width = round(max_width * PDF_IMAGE_DPI / 25.4)
+            with Image.open(image_path) as img:
+                # No pixels beyond what the page can show at PDF_IMAGE_DPI (never upscales)
+                img.thumbnail((target_width, target_width * img.height / img.width), Image.Resampling.LANCZOS)
+                image_info = pdf.image(img, x=10, y=pdf.get_y() + 10, w=max_width)
+            pdf.ln(image_info["rendered_height"] + 20)  # Add space after image
         except Exception as e:
             print(f"Error processing image: {e}")
             print("Story Composer requires both story and valid image to complete its task.")
             sys.exit(1)
         
-        # Add story content
-        pdf.set_font('Helvetica', '', 12)
+        # Add story content (still in the regular 12pt metadata font)
         content = story['content'].replace('Story:\n', '').strip()
-        pdf.multi_cell(0, 10, content)
+        pdf.multi_cell(0, 10, content, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         # Add moral lesson
         pdf.ln(10)
         pdf.set_font('Helvetica', 'B', 14)
-        pdf.cell(0, 10, "Moral Lesson:", ln=True)
+        pdf.cell(0, 10, "Moral Lesson:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         pdf.set_font('Helvetica', '', 12)
-        pdf.multi_cell(0, 10, story['moral_lesson'])
+        pdf.multi_cell(0, 10, story['moral_lesson'], new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         # Add footer with metadata
         pdf.ln(10)
         pdf.set_font('Helvetica', '', 10)
         generated_date = datetime.fromisoformat(story['metadata']['generated_date'])
-        pdf.cell(0, 10, f"Generated: {generated_date.strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-        pdf.cell(0, 10, f"Word Count: {story['metadata']['word_count']}", ln=True)
+        pdf.cell(0, 10, f"Generated: {generated_date.strftime('%Y-%m-%d %H:%M:%S')}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        pdf.cell(0, 10, f"Word Count: {story['metadata']['word_count']}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         # Save the PDF
         try: